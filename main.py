@@ -1,14 +1,26 @@
 import uuid
+import asyncio
+import hashlib
 import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from itertools import groupby, islice
 from typing import Dict, Any, List, Optional
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Request, Response
 from pydantic_settings import BaseSettings
-from pydantic import BaseModel, Field, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl, model_validator
 
 import httpx
-from qdrant_client import QdrantClient
+import numpy as np
+import orjson
+from tenacity import (
+    retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+)
+from grpc import RpcError, StatusCode
+from qdrant_client import AsyncQdrantClient, grpc
 from qdrant_client.http import models as rest
+from qdrant_client.http.exceptions import UnexpectedResponse
 
 # ─── Logging Setup ───────────────────────────────────────────────────────────
 logger = logging.getLogger("vector_stores_app")
@@ -38,7 +50,23 @@ class Settings(BaseSettings):
     )
     qdrant_url: str = Field(..., env="QDRANT_URL")
     qdrant_api_key: Optional[str] = Field(None, env="QDRANT_API_KEY")
+    qdrant_pool_size: int = Field(100, env="QDRANT_POOL_SIZE")
+    qdrant_scalar_quantization: bool = Field(True, env="QDRANT_SCALAR_QUANTIZATION")
     request_timeout: float = Field(300.0, env="REQUEST_TIMEOUT")
+    upstage_max_attempts: int = Field(5, env="UPSTAGE_MAX_ATTEMPTS")
+    embed_batch_size: int = Field(32, env="EMBED_BATCH_SIZE")
+    embed_concurrency: int = Field(8, env="EMBED_CONCURRENCY")
+    embed_cache_size: int = Field(1024, env="EMBED_CACHE_SIZE")
+    chunk_size: int = Field(1000, env="CHUNK_SIZE")
+    chunk_overlap: int = Field(100, env="CHUNK_OVERLAP")
+    qdrant_upsert_batch: int = Field(32, env="QDRANT_UPSERT_BATCH")
+    qdrant_upsert_concurrency: int = Field(2, env="QDRANT_UPSERT_CONCURRENCY")
+
+    @model_validator(mode="after")
+    def check_chunking(self) -> "Settings":
+        if not 0 <= self.chunk_overlap < self.chunk_size:
+            raise ValueError("CHUNK_OVERLAP must be at least 0 and less than CHUNK_SIZE")
+        return self
 
     class Config:
         env_file = ".env"
@@ -46,16 +74,140 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
-# ─── HTTP & Qdrant Clients ───────────────────────────────────────────────────
-http_client = httpx.Client(timeout=settings.request_timeout)
-qdrant = QdrantClient(
+# Derived once at startup instead of on every request
+DP_URL = str(settings.upstage_dp_url)
+EMBED_URL = str(settings.upstage_embed_url)
+AUTH_HEADERS = {"Authorization": f"Bearer {settings.upstage_api_key}"}
+
+# ─── Qdrant Client ───────────────────────────────────────────────────────────
+# Shared by all requests; spreads RPCs over a pool of gRPC channels so
+# concurrent calls don't queue behind one HTTP/2 connection
+qdrant = AsyncQdrantClient(
     url=settings.qdrant_url,
     api_key=settings.qdrant_api_key,
-    prefer_grpc=True
+    prefer_grpc=True,
+    pool_size=settings.qdrant_pool_size,
+    grpc_options={
+        "grpc.keepalive_time_ms": 10000,
+        "grpc.keepalive_timeout_ms": 5000,
+        # Also ping idle channels, so dead ones in the pool are noticed and
+        # reconnected before a request lands on them
+        "grpc.keepalive_permit_without_calls": 1,
+        "grpc.http2.max_pings_without_data": 0,
+    }
 )
 
-# ─── In-memory Vector Store Registry ─────────────────────────────────────────
-VECTOR_STORES: Dict[str, Dict[str, Any]] = {}
+# ─── Vector Store Registry (persisted in Qdrant) ─────────────────────────────
+# Store names live in collection metadata and file records are vector-less
+# points in META_COLLECTION, so every worker and restart sees the same state.
+# COSINE stores are kept as DOT collections of unit vectors, with the
+# requested distance recorded in the metadata.
+STORE_PREFIX = "vs_"
+META_COLLECTION = "_meta"
+
+def store_collection(store_id: str) -> str:
+    return f"{STORE_PREFIX}{store_id}"
+
+def store_filter(store_id: str) -> rest.Filter:
+    return rest.Filter(must=[rest.FieldCondition(
+        key="store_id", match=rest.MatchValue(value=store_id))])
+
+def file_filter(file_id: str) -> rest.Filter:
+    return rest.Filter(must=[rest.FieldCondition(
+        key="file_id", match=rest.MatchValue(value=file_id))])
+
+async def ensure_meta_collection() -> None:
+    if await qdrant.collection_exists(META_COLLECTION):
+        return
+    try:
+        await qdrant.create_collection(collection_name=META_COLLECTION, vectors_config={})
+    except Exception:
+        # Another worker may have created it first
+        if not await qdrant.collection_exists(META_COLLECTION):
+            raise
+    await qdrant.create_payload_index(
+        collection_name=META_COLLECTION,
+        field_name="store_id",
+        field_schema="keyword",
+    )
+
+def is_not_found(exc: Exception) -> bool:
+    if isinstance(exc, RpcError):
+        return exc.code() == StatusCode.NOT_FOUND
+    if isinstance(exc, UnexpectedResponse):
+        return exc.status_code == 404
+    # Local mode raises a plain ValueError for unknown collections
+    return isinstance(exc, ValueError) and "not found" in str(exc)
+
+async def get_store(store_id: str) -> Optional[Dict[str, Any]]:
+    coll_name = store_collection(store_id)
+    try:
+        config = (await qdrant.get_collection(coll_name)).config
+    except Exception as e:
+        if is_not_found(e):
+            return None
+        raise
+    metadata = config.metadata or {}
+    return {
+        "name": metadata.get("name"),
+        "collection": coll_name,
+        "dimension": config.params.vectors.size,
+        "distance": rest.Distance(metadata.get("distance", config.params.vectors.distance)),
+    }
+
+async def list_store_files(store_id: str) -> Dict[str, Dict[str, Any]]:
+    files: Dict[str, Dict[str, Any]] = {}
+    offset = None
+    while True:
+        records, offset = await qdrant.scroll(
+            collection_name=META_COLLECTION,
+            scroll_filter=store_filter(store_id),
+            limit=256,
+            offset=offset,
+        )
+        for r in records:
+            files[str(r.id)] = {k: v for k, v in r.payload.items() if k != "store_id"}
+        if offset is None:
+            return files
+
+async def get_file_meta(store_id: str, file_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        uuid.UUID(file_id)
+    except ValueError:
+        return None
+    records = await qdrant.retrieve(collection_name=META_COLLECTION, ids=[file_id])
+    if not records or records[0].payload.get("store_id") != store_id:
+        return None
+    return {k: v for k, v in records[0].payload.items() if k != "store_id"}
+
+async def save_file_meta(store_id: str, file_id: str, file_meta: Dict[str, Any]) -> None:
+    await qdrant.upsert(
+        collection_name=META_COLLECTION,
+        points=[rest.PointStruct(
+            id=file_id, vector={}, payload={"store_id": store_id, **file_meta}
+        )],
+    )
+
+# Store create/rename/delete writes a fresh token here; it is shared by all
+# workers, so it can back the ETag of the store list
+STORES_VERSION_ID = str(uuid.UUID(int=0))
+# Serialized store list for the last version this worker built
+STORES_LIST_CACHE: Dict[str, Any] = {"version": None, "body": b""}
+
+async def get_stores_version() -> str:
+    records = await qdrant.retrieve(collection_name=META_COLLECTION, ids=[STORES_VERSION_ID])
+    return records[0].payload["stores_version"] if records else "0"
+
+async def bump_stores_version() -> None:
+    await qdrant.upsert(
+        collection_name=META_COLLECTION,
+        points=[rest.PointStruct(
+            id=STORES_VERSION_ID, vector={}, payload={"stores_version": uuid.uuid4().hex}
+        )],
+    )
+
+# ─── Embedding Cache (LRU keyed by model + content hash) ─────────────────────
+EMBED_CACHE: "OrderedDict[str, np.ndarray]" = OrderedDict()
 
 # ─── Pydantic Models ─────────────────────────────────────────────────────────
 class CreateVectorStoreRequest(BaseModel):
@@ -72,32 +224,403 @@ class QueryRequest(BaseModel):
     top_k: int = 10
 
 # ─── FastAPI App ────────────────────────────────────────────────────────────
-app = FastAPI(title="Upstage + Qdrant Vector Stores")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled HTTP client shared by all requests for the app's lifetime;
+    # HTTP/2 multiplexes concurrent embed calls over a single TLS session, and
+    # with the brotli extra installed httpx already asks for br-compressed bodies
+    app.state.http = httpx.AsyncClient(
+        headers=AUTH_HEADERS,
+        timeout=settings.request_timeout,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        http2=True,
+    )
+    # Caps in-flight embedding requests to respect Upstage rate limits
+    app.state.embed_slots = asyncio.Semaphore(settings.embed_concurrency)
+    await ensure_meta_collection()
+    try:
+        yield
+    finally:
+        await app.state.http.aclose()
+        await qdrant.close()
+
+app = FastAPI(title="Upstage + Qdrant Vector Stores", lifespan=lifespan)
+
+# ─── Upstage Requests (retried with backoff) ─────────────────────────────────
+backoff = wait_exponential_jitter(initial=0.5, max=8)
+# Longest Retry-After we'll sleep for; a huge value would stall ingestion
+MAX_RETRY_AFTER = 60.0
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+def upstage_wait(retry_state) -> float:
+    # Honor the provider's Retry-After on rate limiting, else back off
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 429:
+        retry_after = exc.response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), MAX_RETRY_AFTER)
+    return backoff(retry_state)
+
+def log_retry(retry_state) -> None:
+    logger.warning(
+        f"Upstage request failed (attempt {retry_state.attempt_number}), "
+        f"retrying: {retry_state.outcome.exception()}"
+    )
+
+upstage_retry = retry(
+    retry=retry_if_exception(is_retryable),
+    stop=stop_after_attempt(settings.upstage_max_attempts),
+    wait=upstage_wait,
+    before_sleep=log_retry,
+    reraise=True,
+)
+
+@upstage_retry
+async def request_document_parse(file: UploadFile) -> Dict[str, Any]:
+    # Rewind so a retry re-sends the whole upload; httpx streams the spooled
+    # file instead of buffering it
+    file.file.seek(0)
+    dp_resp = await app.state.http.post(
+        DP_URL,
+        files={"document": (file.filename, file.file, file.content_type)},
+        data={
+            "ocr": "force",
+            "base64_encoding": "['table']",
+            "model": "document-parse"
+        }
+    )
+    dp_resp.raise_for_status()
+    return orjson.loads(dp_resp.content)
+
+@upstage_retry
+async def request_embeddings(texts: List[str], model: str) -> List[Dict[str, Any]]:
+    # Hold a concurrency slot only while the request is in flight, not
+    # while backing off
+    async with app.state.embed_slots:
+        emb_resp = await app.state.http.post(
+            EMBED_URL,
+            json={"model": model, "input": texts}
+        )
+    emb_resp.raise_for_status()
+    return orjson.loads(emb_resp.content)["data"]
+
+# ─── Embedding Helpers ───────────────────────────────────────────────────────
+def unit_normalize(vector: np.ndarray) -> np.ndarray:
+    # Returns a new array; cached vectors must not be modified in place
+    return vector / (np.linalg.norm(vector) + 1e-12)
+
+def embed_cache_key(model: str, text: str) -> str:
+    return f"{model}:{hashlib.blake2b(text.encode(), digest_size=16).hexdigest()}"
+
+async def embed_texts(texts: List[str], model: str) -> List[np.ndarray]:
+    """Embed several texts in one request, returned in input order.
+
+    Vectors are float32 arrays: 4 bytes per dimension instead of a PyFloat.
+    Texts already in EMBED_CACHE are served from it and not sent upstream.
+    """
+    keys = [embed_cache_key(model, text) for text in texts]
+    found = {k: EMBED_CACHE[k] for k in keys if k in EMBED_CACHE}
+    for k in found:
+        EMBED_CACHE.move_to_end(k)
+    pending = {k: text for k, text in zip(keys, texts) if k not in found}
+    if pending:
+        data = sorted(
+            await request_embeddings(list(pending.values()), model),
+            key=lambda d: d["index"]
+        )
+        if len(data) != len(pending):
+            raise ValueError(f"Expected {len(pending)} embeddings, got {len(data)}")
+        for k, d in zip(pending, data):
+            found[k] = EMBED_CACHE[k] = np.asarray(d["embedding"], dtype=np.float32)
+        while len(EMBED_CACHE) > settings.embed_cache_size:
+            EMBED_CACHE.popitem(last=False)
+    return [found[k] for k in keys]
+
+async def embed_passages(texts: List[str], start: int = 0) -> List[Optional[np.ndarray]]:
+    """Embed passages concurrently in batches; failed ones come back as None."""
+    if len(texts) > settings.embed_batch_size:
+        text_iter = iter(texts)
+        batches = iter(lambda: list(islice(text_iter, settings.embed_batch_size)), [])
+        results = await asyncio.gather(*(
+            embed_passages(batch, start + i * settings.embed_batch_size)
+            for i, batch in enumerate(batches)
+        ))
+        return [v for batch in results for v in batch]
+    try:
+        return await embed_texts(texts, settings.embed_model_passage)
+    except Exception as e:
+        if len(texts) == 1 or is_retryable(e):
+            # Rate limits and outages were already retried; splitting the
+            # batch would only multiply requests against a struggling API
+            logger.error(f"Embedding failed for chunks {start}-{start + len(texts) - 1}: {e}")
+            return [None] * len(texts)
+        logger.warning(f"Batch embedding failed, retrying chunks individually: {e}")
+    # A rejected batch (e.g. one oversized chunk) is retried one by one so a
+    # bad chunk doesn't drop the rest
+    results = await asyncio.gather(*(
+        embed_passages([text], start + i) for i, text in enumerate(texts)
+    ))
+    return [v for batch in results for v in batch]
+
+# ─── Text Chunking ───────────────────────────────────────────────────────────
+SPLIT_SEPARATORS = ("\n\n", "\n", " ")
+
+def split_text(text: str, size: int, overlap: int) -> List[str]:
+    """Split text into chunks of at most `size` chars overlapping by `overlap`.
+
+    Chunks end on a paragraph, line or word boundary when one is available.
+    """
+    chunks: List[str] = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            for sep in SPLIT_SEPARATORS:
+                # Cut past the overlap so the next chunk always moves forward
+                cut = text.rfind(sep, start + overlap + 1, end)
+                if cut != -1:
+                    end = cut + len(sep)
+                    break
+        if text[start:end].strip():
+            chunks.append(text[start:end])
+        if end == len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+# ─── Qdrant Helpers ──────────────────────────────────────────────────────────
+async def upsert_points(collection: str, points: List[grpc.PointStruct]) -> None:
+    """Upsert points in fixed-size batches with bounded concurrency.
+
+    Returns once every point is applied and searchable. Calls the raw gRPC
+    stub, since AsyncQdrantClient.upsert deprecates grpc structs; this needs
+    a remote Qdrant reached over gRPC (not local/in-memory mode).
+    """
+    slots = asyncio.Semaphore(settings.qdrant_upsert_concurrency)
+    step = settings.qdrant_upsert_batch
+
+    # Every batch waits until applied: on a sharded collection a batch only
+    # waits on the shards its own points land on, so no single batch can
+    # vouch for the others. Bounded concurrency keeps the extra latency small.
+    async def upsert_batch(batch: List[grpc.PointStruct]) -> None:
+        async with slots:
+            await qdrant.grpc_points.Upsert(
+                grpc.UpsertPoints(collection_name=collection, wait=True, points=batch),
+                timeout=settings.request_timeout,
+            )
+
+    # Let every batch settle before raising, so a caller cleaning up after a
+    # failure doesn't race batches that are still being written
+    results = await asyncio.gather(*(
+        upsert_batch(points[i:i + step]) for i in range(0, len(points), step)
+    ), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+
+# ─── Ingestion Pipeline ──────────────────────────────────────────────────────
+class IngestError(Exception):
+    """An ingestion step failed; the message is stored on the file record."""
+
+async def remove_file_vectors(store_id: str, file_id: str) -> None:
+    """Best-effort removal of points written for a file that won't complete."""
+    try:
+        await qdrant.delete(
+            collection_name=store_collection(store_id),
+            points_selector=file_filter(file_id),
+        )
+    except Exception as e:
+        # Nothing to clean up if the whole store is gone
+        if not is_not_found(e):
+            logger.error(f"Failed to remove vectors of file {file_id}: {e}")
+
+async def mark_upload_failed(store_id: str, file_id: str, error: str) -> None:
+    try:
+        file_meta = await get_file_meta(store_id, file_id)
+        # Don't resurrect a record deleted while the upload was processing
+        if file_meta:
+            file_meta.update(status="failed", error=error)
+            await save_file_meta(store_id, file_id, file_meta)
+    except Exception as e:
+        logger.error(f"Could not mark file {file_id} as failed: {e}")
+
+async def process_upload(
+    store_id: str, file_id: str, file: UploadFile, distance: rest.Distance
+) -> None:
+    """Background task: ingest an upload, recording failures on its file entry.
+
+    A hard crash of the worker still leaves the record in "processing".
+    """
+    try:
+        await ingest_upload(store_id, file_id, file, distance)
+    except IngestError as e:
+        await mark_upload_failed(store_id, file_id, str(e))
+    except asyncio.CancelledError:
+        # Shutdown cancelled the task mid-ingest
+        await mark_upload_failed(store_id, file_id, "Ingestion interrupted")
+        raise
+    except Exception as e:
+        logger.exception(f"Ingestion of file {file_id} failed: {e}")
+        await mark_upload_failed(store_id, file_id, "Unexpected ingestion error")
+
+async def ingest_upload(
+    store_id: str, file_id: str, file: UploadFile, distance: rest.Distance
+) -> None:
+    """Parse, embed and store an upload, then mark its file entry completed."""
+    file_meta = await get_file_meta(store_id, file_id)
+    if not file_meta:
+        # Store or file was deleted before processing started
+        return
+
+    # Document parsing
+    try:
+        json_resp = await request_document_parse(file)
+        elements = json_resp.get("elements")
+        if isinstance(elements, list) and elements:
+            # Elements arrive in document order, so consecutive runs with the
+            # same page number form a page; no map or sort needed
+            pages = []
+            for _, group in groupby(elements, key=lambda el: el.get("page", 1)):
+                html = "\n".join(filter(None, (
+                    (el.get("content") or {}).get("html") for el in group
+                )))
+                if html:
+                    pages.append(html)
+        else:
+            content_obj = json_resp.get("content") or {}
+            html = content_obj.get("html") or content_obj.get("text") or ""
+            pages = [html] if html else []
+        if not pages:
+            raise ValueError("Invalid parse response structure: no pages extracted")
+    except (httpx.HTTPError, ValueError) as e:
+        logger.error(f"Document parse failed: {e}")
+        raise IngestError("Document parsing failed") from e
+
+    # (page, chunk index within page, text); keeps requests under payload limits
+    chunks = [
+        (page, chunk_idx, text)
+        for page, page_text in enumerate(pages)
+        for chunk_idx, text in enumerate(
+            split_text(page_text, settings.chunk_size, settings.chunk_overlap)
+        )
+    ]
+    vectors = await embed_passages([text for _, _, text in chunks])
+    if distance == rest.Distance.COSINE:
+        vectors = [v if v is None else unit_normalize(v) for v in vectors]
+
+    # Raw gRPC structs go straight to protobuf, skipping pydantic validation;
+    # tolist() is much faster for protobuf to copy than per-element numpy scalars
+    points: List[grpc.PointStruct] = [
+        grpc.PointStruct(
+            id=grpc.PointId(uuid=uuid.uuid4().hex),
+            vectors=grpc.Vectors(
+                vector=grpc.Vector(dense=grpc.DenseVector(data=vector.tolist()))
+            ),
+            payload={
+                "file": grpc.Value(string_value=file.filename),
+                "file_id": grpc.Value(string_value=file_id),
+                "page": grpc.Value(integer_value=page),
+                "chunk": grpc.Value(integer_value=chunk_idx),
+            }
+        )
+        for (page, chunk_idx, _), vector in zip(chunks, vectors)
+        if vector is not None
+    ]
+
+    if not points:
+        raise IngestError("No embeddings generated")
+
+    # Parsing and embedding take a while; skip the write if the file or its
+    # store was deleted meanwhile
+    if not await get_file_meta(store_id, file_id):
+        return
+    try:
+        await upsert_points(store_collection(store_id), points)
+    except Exception as e:
+        logger.error(f"Qdrant upsert failed: {e}")
+        # Batches that did land would leave a failed file searchable
+        await remove_file_vectors(store_id, file_id)
+        raise IngestError("Failed to store embeddings") from e
+
+    # A delete that landed during the upsert missed these points; remove them
+    # rather than saving the record back
+    file_meta = await get_file_meta(store_id, file_id)
+    if not file_meta:
+        await remove_file_vectors(store_id, file_id)
+        return
+    # Chunks whose embedding failed even after retries are left out; record
+    # them so a partial ingest doesn't pass for a complete one
+    failed_chunks = len(chunks) - len(points)
+    if failed_chunks:
+        logger.warning(
+            f"File {file_id}: {failed_chunks} of {len(chunks)} chunks could not be embedded"
+        )
+    file_meta.update(
+        status="completed", pages=len(pages), chunks=len(points), failed_chunks=failed_chunks
+    )
+    await save_file_meta(store_id, file_id, file_meta)
+    logger.info(
+        f"Ingested file {file.filename} as {file_id} "
+        f"({len(pages)} pages, {len(points)} chunks)"
+    )
+
+
+async def require_store(store_id: str) -> Dict[str, Any]:
+    try:
+        meta = await get_store(store_id)
+    except Exception as e:
+        logger.error(f"Error loading vector store {store_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load vector store")
+    if not meta:
+        raise HTTPException(status_code=404, detail="Vector store not found")
+    return meta
+
+async def require_file(store_id: str, file_id: str) -> Dict[str, Any]:
+    try:
+        file_meta = await get_file_meta(store_id, file_id)
+    except Exception as e:
+        logger.error(f"Error loading file {file_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load file")
+    if not file_meta:
+        raise HTTPException(status_code=404, detail="File not found")
+    return file_meta
 
 @app.post("/vector_stores", status_code=201)
-def create_vector_store(req: CreateVectorStoreRequest):
+async def create_vector_store(req: CreateVectorStoreRequest):
     store_id = str(uuid.uuid4())
-    coll_name = f"vs_{store_id}"
+    coll_name = store_collection(store_id)
     try:
-        qdrant.recreate_collection(
+        await qdrant.create_collection(
             collection_name=coll_name,
             vectors_config=rest.VectorParams(
-                size=req.dimension, distance=req.distance
+                size=req.dimension,
+                # Vectors are unit-normalized client-side, so cosine == dot
+                distance=rest.Distance.DOT
+                if req.distance == rest.Distance.COSINE else req.distance,
+                # With quantization on, search runs on the int8 copies, so the
+                # float32 originals can live on disk for rescoring only
+                on_disk=settings.qdrant_scalar_quantization,
             ),
+            # int8 copies pinned in RAM are ~4x smaller than the originals
+            quantization_config=rest.ScalarQuantization(
+                scalar=rest.ScalarQuantizationConfig(
+                    type=rest.ScalarType.INT8, quantile=0.99, always_ram=True
+                )
+            ) if settings.qdrant_scalar_quantization else None,
+            metadata={"name": req.name, "distance": req.distance.value},
         )
-        # Index 'file' payload for keyword filtering
-        qdrant.create_payload_index(
+        # Index 'file_id' payload so a file's points can be deleted by filter
+        await qdrant.create_payload_index(
             collection_name=coll_name,
-            field_name="file",
+            field_name="file_id",
             field_schema="keyword",
         )
-        VECTOR_STORES[store_id] = {
-            "name": req.name,
-            "collection": coll_name,
-            "dimension": req.dimension,
-            "distance": req.distance,
-            "files": {}
-        }
+        await bump_stores_version()
         logger.info(f"Created vector store {store_id}")
         return {"id": store_id, "name": req.name}
     except Exception as e:
@@ -105,167 +628,133 @@ def create_vector_store(req: CreateVectorStoreRequest):
         raise HTTPException(status_code=500, detail="Failed to create vector store")
 
 @app.get("/vector_stores")
-def list_vector_stores():
-    return [
-        {"id": sid, "name": m["name"], "dimension": m["dimension"], "distance": m["distance"]}
-        for sid, m in VECTOR_STORES.items()
-    ]
+async def list_vector_stores(request: Request):
+    # Read the version before the stores: a concurrent change then yields a
+    # stale ETag (forcing a refetch later), never a stale body
+    try:
+        version = await get_stores_version()
+        etag = f'W/"{version}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        if STORES_LIST_CACHE["version"] != version:
+            collections = (await qdrant.get_collections()).collections
+            store_ids = [
+                c.name[len(STORE_PREFIX):] for c in collections if c.name.startswith(STORE_PREFIX)
+            ]
+            stores = await asyncio.gather(*(get_store(sid) for sid in store_ids))
+            STORES_LIST_CACHE.update(version=version, body=orjson.dumps([
+                {
+                    "id": sid, "name": m["name"],
+                    "dimension": m["dimension"], "distance": m["distance"],
+                }
+                for sid, m in zip(store_ids, stores)
+                if m
+            ]))
+    except Exception as e:
+        logger.error(f"Error listing vector stores: {e}")
+        raise HTTPException(status_code=500, detail="Failed to list vector stores")
+    return Response(
+        content=STORES_LIST_CACHE["body"],
+        media_type="application/json",
+        headers={"ETag": etag},
+    )
 
 @app.get("/vector_stores/{store_id}")
-def get_vector_store(store_id: str):
-    meta = VECTOR_STORES.get(store_id)
-    if not meta:
-        raise HTTPException(status_code=404, detail="Vector store not found")
-    return {"id": store_id, **meta}
+async def get_vector_store(store_id: str):
+    meta = await require_store(store_id)
+    try:
+        return {"id": store_id, **meta, "files": await list_store_files(store_id)}
+    except Exception as e:
+        logger.error(f"Error listing files of vector store {store_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to list files")
 
 @app.patch("/vector_stores/{store_id}")
-def update_vector_store(store_id: str, req: UpdateVectorStoreRequest):
-    meta = VECTOR_STORES.get(store_id)
-    if not meta:
-        raise HTTPException(status_code=404, detail="Vector store not found")
+async def update_vector_store(store_id: str, req: UpdateVectorStoreRequest):
+    meta = await require_store(store_id)
+    # Changing the metric would mean dropping and rebuilding the whole index
+    if req.distance and req.distance != meta["distance"]:
+        raise HTTPException(
+            status_code=400,
+            detail="Distance is immutable; create a new store and reingest"
+        )
     try:
         if req.name:
-            meta["name"] = req.name
-        if req.distance and req.distance != meta["distance"]:
-            qdrant.recreate_collection(
+            await qdrant.update_collection(
                 collection_name=meta["collection"],
-                vectors_config=rest.VectorParams(
-                    size=meta["dimension"], distance=req.distance
-                ),
+                metadata={"name": req.name, "distance": meta["distance"].value},
             )
-            # Re-index 'file' payload after recreation
-            qdrant.create_payload_index(
-                collection_name=meta["collection"],
-                field_name="file",
-                field_schema="keyword",
-            )
-            meta["distance"] = req.distance
+            meta["name"] = req.name
+            await bump_stores_version()
         logger.info(f"Updated vector store {store_id}")
-        return {"id": store_id, **meta}
+        return {"id": store_id, **meta, "files": await list_store_files(store_id)}
     except Exception as e:
         logger.error(f"Error updating vector store {store_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to update vector store")
 
 @app.delete("/vector_stores/{store_id}")
-def delete_vector_store(store_id: str):
-    meta = VECTOR_STORES.pop(store_id, None)
-    if not meta:
-        raise HTTPException(status_code=404, detail="Vector store not found")
+async def delete_vector_store(store_id: str):
+    meta = await require_store(store_id)
     try:
-        qdrant.delete_collection(collection_name=meta["collection"])
+        await qdrant.delete_collection(collection_name=meta["collection"])
+        await qdrant.delete(
+            collection_name=META_COLLECTION, points_selector=store_filter(store_id)
+        )
+        await bump_stores_version()
         logger.info(f"Deleted vector store {store_id}")
         return {"status": "deleted"}
     except Exception as e:
         logger.error(f"Error deleting vector store {store_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to delete vector store")
 
-@app.post("/vector_stores/{store_id}/files", status_code=201)
-def upload_file(store_id: str, file: UploadFile = File(...)):
-    meta = VECTOR_STORES.get(store_id)
-    if not meta:
-        raise HTTPException(status_code=404, detail="Vector store not found")
-    try:
-        content = file.file.read()
-    except Exception as e:
-        logger.error(f"Error reading uploaded file: {e}")
-        raise HTTPException(status_code=400, detail="Invalid file upload")
+@app.post("/vector_stores/{store_id}/files", status_code=202)
+async def upload_file(
+    store_id: str, background_tasks: BackgroundTasks, file: UploadFile = File(...)
+):
+    meta = await require_store(store_id)
 
-    # Document parsing
+    # Parse/embed/upsert can take minutes, so run it after responding
+    file_id = str(uuid.uuid4())
     try:
-        dp_resp = http_client.post(
-            str(settings.upstage_dp_url),
-            headers={"Authorization": f"Bearer {settings.upstage_api_key}"},
-            files={"document": (file.filename, content)},
-            data={
-                "ocr": "force",
-                "base64_encoding": "['table']",
-                "model": "document-parse"
-            }
-        )
-        dp_resp.raise_for_status()
-        json_resp = dp_resp.json()
-        elements = json_resp.get("elements")
-        if isinstance(elements, list) and elements:
-            pages_map: Dict[int, List[str]] = {}
-            for el in elements:
-                pg = el.get("page", 1)
-                html = el.get("content", {}).get("html", "")
-                if html:
-                    pages_map.setdefault(pg, []).append(html)
-            pages = ["\n".join(pages_map[p]) for p in sorted(pages_map)]
-        else:
-            content_obj = json_resp.get("content", {})
-            html = content_obj.get("html") or content_obj.get("text") or ""
-            pages = [html] if html else []
-        if not pages:
-            raise ValueError("Invalid parse response structure: no pages extracted")
-    except (httpx.HTTPError, ValueError) as e:
-        logger.error(f"Document parse failed: {e}")
-        raise HTTPException(status_code=500, detail="Document parsing failed")
-
-    points: List[rest.PointStruct] = []
-    for idx, text in enumerate(pages):
-        try:
-            emb_resp = http_client.post(
-                str(settings.upstage_embed_url),
-                headers={"Authorization": f"Bearer {settings.upstage_api_key}"},
-                json={"model": settings.embed_model_passage, "input": [text]}
-            )
-            emb_resp.raise_for_status()
-            vector = emb_resp.json()["data"][0]["embedding"]
-        except Exception as e:
-            logger.error(f"Embedding failed for page {idx}: {e}")
-            continue
-        points.append(
-            rest.PointStruct(
-                id=str(uuid.uuid4()),
-                vector=vector,
-                payload={"file": file.filename, "page": idx}
-            )
+        await save_file_meta(
+            store_id, file_id, {"filename": file.filename, "status": "processing", "pages": None}
         )
-
-    if not points:
-        raise HTTPException(status_code=500, detail="No embeddings generated")
-
-    try:
-        qdrant.upsert(collection_name=meta["collection"], points=points)
     except Exception as e:
-        logger.error(f"Qdrant upsert failed: {e}")
-        raise HTTPException(status_code=500, detail="Failed to store embeddings")
-
-    file_id = str(uuid.uuid4())
-    meta["files"][file_id] = {"filename": file.filename, "pages": len(pages)}
-    logger.info(f"Ingested file {file.filename} as {file_id} ({len(pages)} pages)")
-    return {"file_id": file_id, "pages": len(pages)}
+        logger.error(f"Error registering file {file.filename}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to register file")
+    background_tasks.add_task(process_upload, store_id, file_id, file, meta["distance"])
+    logger.info(f"Queued file {file.filename} as {file_id}")
+    return {"file_id": file_id, "status": "processing"}
 
 @app.get("/vector_stores/{store_id}/files")
-def list_files(store_id: str):
-    meta = VECTOR_STORES.get(store_id)
-    if not meta:
-        raise HTTPException(status_code=404, detail="Vector store not found")
-    return meta["files"]
+async def list_files(store_id: str):
+    await require_store(store_id)
+    try:
+        return await list_store_files(store_id)
+    except Exception as e:
+        logger.error(f"Error listing files of vector store {store_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to list files")
 
 @app.get("/vector_stores/{store_id}/files/{file_id}")
-def get_file(store_id: str, file_id: str):
-    meta = VECTOR_STORES.get(store_id)
-    file_meta = meta["files"].get(file_id) if meta else None
-    if not file_meta:
-        raise HTTPException(status_code=404, detail="File not found")
+async def get_file(store_id: str, file_id: str):
+    file_meta = await require_file(store_id, file_id)
     return file_meta
 
 @app.delete("/vector_stores/{store_id}/files/{file_id}")
-def delete_file(store_id: str, file_id: str):
-    meta = VECTOR_STORES.get(store_id)
-    file_meta = meta["files"].get(file_id) if meta else None
-    if not file_meta:
-        raise HTTPException(status_code=404, detail="File not found")
+async def delete_file(store_id: str, file_id: str):
+    file_meta = await require_file(store_id, file_id)
     try:
-        qdrant.delete(
-            collection_name=meta["collection"],
-            points_selector=rest.Filter(must=[rest.FieldCondition(
-                key="file", match=rest.MatchValue(value=file_meta["filename"]) )])
+        # Filenames can repeat across uploads, so match on file_id. wait=False
+        # returns once the delete is queued; the points disappear from search
+        # shortly after rather than before this call returns.
+        await qdrant.delete(
+            collection_name=store_collection(store_id),
+            points_selector=file_filter(file_id),
+            wait=False,
+        )
+        await qdrant.delete(
+            collection_name=META_COLLECTION,
+            points_selector=rest.PointIdsList(points=[file_id]),
         )
-        del meta["files"][file_id]
         logger.info(f"Deleted file {file_id} from store {store_id}")
         return {"status": "deleted"}
     except Exception as e:
@@ -273,25 +762,27 @@ def delete_file(store_id: str, file_id: str):
         raise HTTPException(status_code=500, detail="Failed to delete file vectors")
 
 @app.post("/vector_stores/{store_id}/query")
-def query_vectors(store_id: str, req: QueryRequest):
-    meta = VECTOR_STORES.get(store_id)
-    if not meta:
-        raise HTTPException(status_code=404, detail="Vector store not found")
+async def query_vectors(store_id: str, req: QueryRequest):
+    meta = await require_store(store_id)
     try:
-        emb_resp = http_client.post(
-            str(settings.upstage_embed_url),
-            headers={"Authorization": f"Bearer {settings.upstage_api_key}"},
-            json={"model": settings.embed_model_query, "input": [req.query]}
-        )
-        emb_resp.raise_for_status()
-        q_vec = emb_resp.json()["data"][0]["embedding"]
+        q_vec = (await embed_texts([req.query], settings.embed_model_query))[0]
+        if meta["distance"] == rest.Distance.COSINE:
+            q_vec = unit_normalize(q_vec)
     except Exception as e:
         logger.error(f"Query embedding failed: {e}")
         raise HTTPException(status_code=500, detail="Failed to embed query")
 
     try:
-        hits = qdrant.search(collection_name=meta["collection"], query_vector=q_vec, limit=req.top_k)
-        return [{"id": h.id, "score": h.score, "payload": h.payload} for h in hits]
+        hits = await qdrant.query_points(
+            collection_name=meta["collection"],
+            query=q_vec,
+            limit=req.top_k,
+            # No-op on collections without quantization
+            search_params=rest.SearchParams(
+                quantization=rest.QuantizationSearchParams(rescore=True, oversampling=2.0)
+            ),
+        )
+        return [{"id": h.id, "score": h.score, "payload": h.payload} for h in hits.points]
     except Exception as e:
         logger.error(f"Qdrant search failed: {e}")
         raise HTTPException(status_code=500, detail="Search operation failed")
@@ -1,6 +1,7 @@
 # tests/test_api.py
 
 import os
+import time
 import requests
 import pytest
 
@@ -8,6 +9,35 @@ import pytest
 BASE_URL = os.getenv("API_URL", "http://localhost:8000")
 # Path to a sample PDF for testing
 TEST_PDF_PATH = os.path.join(os.path.dirname(__file__), "test.pdf")
+# Seconds to wait for background ingestion of the sample PDF
+INGEST_TIMEOUT = float(os.getenv("INGEST_TIMEOUT", "300"))
+
+
+def upload_test_pdf(store_id):
+    """Upload the sample PDF and wait for background ingestion to finish."""
+    assert os.path.exists(TEST_PDF_PATH), "test.pdf not found in tests directory"
+    with open(TEST_PDF_PATH, "rb") as pdf_file:
+        files = {"file": ("test.pdf", pdf_file, "application/pdf")}
+        resp = requests.post(
+            f"{BASE_URL}/vector_stores/{store_id}/files", files=files
+        )
+    assert resp.status_code == 202, f"File upload failed: {resp.text}"
+    file_data = resp.json()
+    file_id = file_data.get("file_id")
+    assert file_id, "File ID not returned"
+    assert file_data.get("status") == "processing"
+
+    # Ingestion runs in the background; poll until it finishes
+    deadline = time.time() + INGEST_TIMEOUT
+    while True:
+        resp = requests.get(f"{BASE_URL}/vector_stores/{store_id}/files/{file_id}")
+        assert resp.status_code == 200, f"Get file status failed: {resp.text}"
+        file_data = resp.json()
+        if file_data.get("status") != "processing" or time.time() > deadline:
+            break
+        time.sleep(1)
+    assert file_data.get("status") == "completed", f"Ingestion did not complete: {file_data}"
+    return {"file_id": file_id, **file_data}
 
 
 def test_full_workflow():
@@ -30,6 +60,12 @@ def test_full_workflow():
     assert resp.status_code == 200, f"List stores failed: {resp.text}"
     stores = resp.json()
     assert any(s.get("id") == store_id for s in stores)
+    etag = resp.headers.get("ETag")
+    assert etag, "Store list has no ETag"
+
+    # An unchanged store list is revalidated without a body
+    resp = requests.get(f"{BASE_URL}/vector_stores", headers={"If-None-Match": etag})
+    assert resp.status_code == 304, f"Expected 304 for unchanged list: {resp.status_code}"
 
     # 3. Retrieve vector store
     resp = requests.get(f"{BASE_URL}/vector_stores/{store_id}")
@@ -45,17 +81,29 @@ def test_full_workflow():
     updated = resp.json()
     assert updated.get("name") == "updated_pytest"
 
+    # The rename invalidates the old ETag
+    resp = requests.get(f"{BASE_URL}/vector_stores", headers={"If-None-Match": etag})
+    assert resp.status_code == 200, f"Stale ETag not refreshed: {resp.status_code}"
+    assert resp.headers.get("ETag") and resp.headers.get("ETag") != etag
+    assert any(
+        s.get("id") == store_id and s.get("name") == "updated_pytest" for s in resp.json()
+    )
+
+    # Distance can't change; the check uses the requested metric (Cosine),
+    # not the DOT metric the collection is stored with
+    resp = requests.patch(
+        f"{BASE_URL}/vector_stores/{store_id}", json={"distance": "Dot"}
+    )
+    assert resp.status_code == 400, f"Distance change not rejected: {resp.text}"
+    resp = requests.patch(
+        f"{BASE_URL}/vector_stores/{store_id}", json={"distance": "Cosine"}
+    )
+    assert resp.status_code == 200, f"Unchanged distance rejected: {resp.text}"
+    assert resp.json().get("distance") == "Cosine"
+
     # 5. Upload a sample PDF file
-    assert os.path.exists(TEST_PDF_PATH), "test.pdf not found in tests directory"
-    with open(TEST_PDF_PATH, "rb") as pdf_file:
-        files = {"file": ("test.pdf", pdf_file, "application/pdf")}
-        resp = requests.post(
-            f"{BASE_URL}/vector_stores/{store_id}/files", files=files
-        )
-    assert resp.status_code == 201, f"File upload failed: {resp.text}"
-    file_data = resp.json()
-    file_id = file_data.get("file_id")
-    assert file_id, "File ID not returned"
+    file_data = upload_test_pdf(store_id)
+    file_id = file_data["file_id"]
     # Expect at least one page extracted from PDF
     assert isinstance(file_data.get("pages"), int) and file_data.get("pages") >= 1
 
@@ -82,13 +130,35 @@ def test_full_workflow():
     results = resp.json()
     assert isinstance(results, list), "Query did not return list"
 
-    # 9. Delete ingested file
+    # 9. Delete ingested file, leaving a second upload with the same name
+    other_id = upload_test_pdf(store_id)["file_id"]
     resp = requests.delete(
         f"{BASE_URL}/vector_stores/{store_id}/files/{file_id}"
     )
     assert resp.status_code == 200, f"Delete file failed: {resp.text}"
     assert resp.json().get("status") == "deleted"
 
+    resp = requests.get(f"{BASE_URL}/vector_stores/{store_id}/files")
+    assert resp.status_code == 200, f"List files failed: {resp.text}"
+    files_list = resp.json()
+    assert file_id not in files_list and other_id in files_list
+
+    # Vector deletion is asynchronous; wait for the deleted file's hits to go
+    deadline = time.time() + 30
+    while True:
+        resp = requests.post(
+            f"{BASE_URL}/vector_stores/{store_id}/query", json={
+                "query": "test",
+                "top_k": 10
+            }
+        )
+        assert resp.status_code == 200, f"Query failed: {resp.text}"
+        hit_files = {h["payload"]["file_id"] for h in resp.json()}
+        if file_id not in hit_files or time.time() > deadline:
+            break
+        time.sleep(1)
+    assert hit_files == {other_id}, f"Unexpected files in query hits: {hit_files}"
+
     # 10. Delete vector store
     resp = requests.delete(f"{BASE_URL}/vector_stores/{store_id}")
     assert resp.status_code == 200, f"Delete store failed: {resp.text}"
@@ -0,0 +1,51 @@
+# tests/test_split_text.py
+
+import os
+import sys
+
+# main builds its settings at import time; only the required values are set here
+os.environ.setdefault("UPSTAGE_API_KEY", "test")
+os.environ.setdefault("QDRANT_URL", "http://localhost:6333")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from main import Settings, split_text
+
+
+def test_short_text_is_one_chunk():
+    assert split_text("hello world", 100, 10) == ["hello world"]
+
+
+def test_empty_and_blank_text_give_no_chunks():
+    assert split_text("", 100, 10) == []
+    assert split_text("   \n\n  ", 100, 10) == []
+
+
+def test_chunks_respect_size_and_overlap():
+    text = " ".join(f"word{i}" for i in range(200))
+    chunks = split_text(text, 50, 10)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 50 for chunk in chunks)
+    # Each chunk starts inside the tail of the previous one
+    for prev, chunk in zip(chunks, chunks[1:]):
+        assert prev[-10:] in chunk
+    assert chunks[-1].endswith("word199")
+
+
+def test_prefers_paragraph_boundaries():
+    text = "a" * 30 + "\n\n" + "b" * 30
+    chunks = split_text(text, 40, 0)
+    assert chunks == ["a" * 30 + "\n\n", "b" * 30]
+
+
+def test_hard_cut_without_separators():
+    chunks = split_text("x" * 25, 10, 3)
+    assert all(len(chunk) <= 10 for chunk in chunks)
+    assert chunks[-1].endswith("x")
+    assert "".join(chunk[3:] if i else chunk for i, chunk in enumerate(chunks)) == "x" * 25
+
+
+@pytest.mark.parametrize("size, overlap", [(100, 100), (100, 150), (100, -1)])
+def test_settings_reject_bad_overlap(size, overlap):
+    with pytest.raises(ValueError):
+        Settings(chunk_size=size, chunk_overlap=overlap)